@@ -97,6 +97,10 @@ class StringContent(AstNode):
     def get_strparts(self):
         return self.strparts
 
+    def append_part(self, part, endidx):
+        self.strparts.append(part)
+        self._endidx = endidx
+
 
 class InterpString(AstNode):
     def __init__(self, strings, exprs, srcpos=None):
@@ -131,6 +135,10 @@ class InterpStringContents(AstNode):
     def get_exprs(self):
         return self.exprs
 
+    def append_segment(self, string, expr):
+        self.strings.append(string)
+        self.exprs.append(expr)
+
 
 class List(AstNode):
     def __init__(self, items, srcpos):
@@ -565,26 +573,18 @@ class FunctionBody(AstNode):
         self.next = next
 
     def get_element_list(self):
-        count = 0
+        # The chain hangs off 'next' in reverse source order; collect in
+        # one pass and reverse at the end.
+        lst = []
         cur = self
         while cur.next is not None:
             if cur.elem is not None:
-                count += 1
+                lst.append(cur.elem)
             cur = cur.next
             assert isinstance(cur, FunctionBody)
         if cur.elem is not None:
-            count += 1
-        cur = self
-        lst = [None] * count
-        i = len(lst) - 1
-        while cur.next is not None:
-            if cur.elem is not None:
-                lst[i] = cur.elem
-                i -= 1
-            cur = cur.next
-            assert isinstance(cur, FunctionBody)
-        if cur.elem is not None:
-            lst[i] = cur.elem
+            lst.append(cur.elem)
+        lst.reverse()
         return lst
 
 
@@ -676,20 +676,11 @@ class ExpressionListPartial(AstNode):
         self.next = next
 
     def get_element_list(self):
-        i = 0
+        elements = []
         cur = self
         while cur.next:
             if cur.elem is not None:
-                i += 1
-            cur = cur.next
-            assert isinstance(cur, ExpressionListPartial)
-        elements = [None] * i
-        i = 0
-        cur = self
-        while cur.next:
-            if cur.elem is not None:
-                elements[i] = cur.elem
-                i += 1
+                elements.append(cur.elem)
             cur = cur.next
             assert isinstance(cur, ExpressionListPartial)
         return elements
@@ -704,18 +695,11 @@ class VarDeclPartial(AstNode):
         self.next = next
 
     def get_vars(self):
-        i = 0
-        cur = self
-        while cur.next:
-            cur = cur.next
-            assert isinstance(cur, VarDeclPartial)
-            i += 1
-        vars = [None] * i
-        i = 0
+        vars = []
         cur = self
         while cur.next:
-            vars[i] = Var(cur.name, cur.tp, cur.default, srcpos=cur.getsrcpos())
-            i += 1
+            vars.append(Var(cur.name, cur.tp, cur.default,
+                            srcpos=cur.getsrcpos()))
             cur = cur.next
             assert isinstance(cur, VarDeclPartial)
         return vars
@@ -855,18 +839,10 @@ class IdentifierListPartial(AstNode):
         self.extra = extra
 
     def get_names(self):
-        count = 0
-        cur = self
-        while cur is not None:
-            count += 1
-            assert isinstance(cur, IdentifierListPartial)
-            cur = cur.next
-        lst = [None] * count
-        i = 0
+        lst = []
         cur = self
         while cur is not None:
             assert isinstance(cur, IdentifierListPartial)
-            lst[i] = cur.name
+            lst.append(cur.name)
             cur = cur.next
-            i += 1
         return lst
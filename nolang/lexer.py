@@ -1,22 +1,31 @@
-from rply.lexergenerator import Rule
-from rply.token import Token as RplyToken
+from rply.token import BaseBox
 
 
-class Token(RplyToken):
-    def getsrcpos(self):
-        return (self.source_pos.start, self.source_pos.end)
-
-
-class SourceRange(object):
-    def __init__(self, start, end, lineno, colno):
+class Token(BaseBox):
+    # Carries its source range inline rather than through a separate
+    # position object; getsourcepos() hands out the token itself.
+    def __init__(self, name, value, start, end, lineno, colno):
+        self.name = name
+        self.value = value
         self.start = start
         self.end = end
         self.lineno = lineno
         self.colno = colno
 
     def __repr__(self):
-        return "SourceRange(start=%d, end=%d, lineno=%d, colno=%d)" % (
-            self.start, self.end, self.lineno, self.colno)
+        return "Token(%r, %r)" % (self.name, self.value)
+
+    def gettokentype(self):
+        return self.name
+
+    def getsourcepos(self):
+        return self
+
+    def getstr(self):
+        return self.value
+
+    def getsrcpos(self):
+        return (self.start, self.end)
 
 
 class ParseError(Exception):
@@ -34,35 +43,35 @@ class ParseError(Exception):
                 "^" * (self.end_colno - self.start_colno))
 
 
-QUILL_RULES = [
-    ('INTEGER', r'\d+'),
-    ('PLUS', r'\+'),
-    ('MINUS', r'\-'),
-    ('LE', r'\<='),
-    ('GE', r'\>='),
-    ('LT', r'\<'),
-    ('GT', r'\>'),
-    ('STAR', r'\*'),
-    ('DOT', r'\.'),
-    ('TRUEDIV', r'\/\/'),
-    ('COLON', r':'),
-    ('EQ', r'=='),
-    ('NE', r'!='),
-    ('ASSIGN', r'='),
-    ('ST_DQ_STRING', r'"'),
-    ('ST_SQ_STRING', r"'"),
-    ('ST_INTERP_STRING', r'`'),
-    ('ST_RAW_DQ_STRING', r'r"'),
-    ('ST_RAW_SQ_STRING', r"r'"),
-    ('IDENTIFIER', r'[a-zA-Z_][a-zA-Z0-9_]*'),
-    ('LEFT_CURLY_BRACE', r'\{'),
-    ('LEFT_PAREN', r'\('),
-    ('RIGHT_PAREN', r'\)'),
-    ('RIGHT_CURLY_BRACE', r'\}'),
-    ('LEFT_SQUARE_BRACKET', r'\['),
-    ('RIGHT_SQUARE_BRACKET', r'\]'),
-    ('COMMA', r','),
-    ('SEMICOLON', r';'),
+QUILL_TOKENS = [
+    'INTEGER',
+    'PLUS',
+    'MINUS',
+    'LE',
+    'GE',
+    'LT',
+    'GT',
+    'STAR',
+    'DOT',
+    'TRUEDIV',
+    'COLON',
+    'EQ',
+    'NE',
+    'ASSIGN',
+    'ST_DQ_STRING',
+    'ST_SQ_STRING',
+    'ST_INTERP_STRING',
+    'ST_RAW_DQ_STRING',
+    'ST_RAW_SQ_STRING',
+    'IDENTIFIER',
+    'LEFT_CURLY_BRACE',
+    'LEFT_PAREN',
+    'RIGHT_PAREN',
+    'RIGHT_CURLY_BRACE',
+    'LEFT_SQUARE_BRACKET',
+    'RIGHT_SQUARE_BRACKET',
+    'COMMA',
+    'SEMICOLON',
 ]
 
 KEYWORDS = [
@@ -90,37 +99,29 @@ KEYWORDS = [
 ]
 
 
-def make_string_rules(quote, interp=False):
-    interp_rules = []
-    esc_quote = r'\\' + quote
-    char = r'[^' + quote + r'\\]'
-    esc_simple_chars = r'abfnrtv0'
-    if interp:
-        esc_simple_chars += r'\$'
-        interp_rules = [('ST_INTERP', r'\$\{')]
-    esc_simple = r'\\[' + esc_simple_chars + r']'
-    esc_unrecognised = r'\\[^' + esc_simple_chars + quote + r'xu\\]'
-
-    rules = [
-        ('ESC_QUOTE', esc_quote),
-        ('ESC_ESC', r'\\\\'),
-    ] + interp_rules + [
-        ('CHAR', char),
-        ('ESC_SIMPLE', esc_simple),
-        ('ESC_HEX_8', r'\\x[0-9a-fA-F]{2}'),
-        ('ESC_HEX_16', r'\\u[0-9a-fA-F]{4}'),
-        ('ESC_HEX_ANY', r'\\u\{[0-9a-fA-F]+\}'),
-        ('ESC_UNRECOGNISED', esc_unrecognised),
-        ('ST_ENDSTRING', quote),
-    ]
-    return rules
-
-
-DQ_STRING_RULES = make_string_rules(r'"', False)
-SQ_STRING_RULES = make_string_rules(r"'", False)
-INTERP_STRING_RULES = make_string_rules(r'`', True)
-
-QUILL_NO_ALI = (
+STRING_TOKENS = [
+    'ESC_QUOTE',
+    'ESC_ESC',
+    'ST_INTERP',
+    'CHAR',
+    'ESC_SIMPLE',
+    'ESC_HEX_8',
+    'ESC_HEX_16',
+    'ESC_HEX_ANY',
+    'ESC_UNRECOGNISED',
+    'ST_ENDSTRING',
+]
+
+RAW_STRING_TOKENS = [
+    'RAW_ESC',
+    'RAW_CHAR',
+    'ST_ENDRAW',
+]
+
+# Token names after which a newline inserts an automatic SEMICOLON.
+# A dict rather than a set: membership is tested per skipped newline and
+# sets don't translate.
+QUILL_NO_ALI = dict.fromkeys([
     'RIGHT_CURLY_BRACE',
     'RIGHT_PAREN',
     'IDENTIFIER',
@@ -131,25 +132,136 @@ QUILL_NO_ALI = (
     'RIGHT_SQUARE_BRACKET',
     'ST_ENDSTRING',
     'ST_ENDRAW',
-)
-
+])
+
+
+TOKENS = QUILL_TOKENS + STRING_TOKENS + RAW_STRING_TOKENS + [x.upper() for x in KEYWORDS]
+
+KEYWORD_TOKEN = dict([(kw, kw.upper()) for kw in KEYWORDS])
+
+# Tokens fully recognized by their first character. Multi-character
+# operators and the r"..." / r'...' raw string prefixes are handled by
+# hand in QuillLexerStream.
+SINGLE_CHAR_TOKENS = {
+    '+': 'PLUS',
+    '-': 'MINUS',
+    '*': 'STAR',
+    '.': 'DOT',
+    ':': 'COLON',
+    '{': 'LEFT_CURLY_BRACE',
+    '(': 'LEFT_PAREN',
+    ')': 'RIGHT_PAREN',
+    '}': 'RIGHT_CURLY_BRACE',
+    '[': 'LEFT_SQUARE_BRACKET',
+    ']': 'RIGHT_SQUARE_BRACKET',
+    ',': 'COMMA',
+    ';': 'SEMICOLON',
+    '"': 'ST_DQ_STRING',
+    "'": 'ST_SQ_STRING',
+    '`': 'ST_INTERP_STRING',
+}
+
+# Token classes for the first-byte dispatch table below.
+FB_ERROR = 0
+FB_SINGLE = 1
+FB_INTEGER = 2
+FB_IDENTIFIER = 3
+FB_OPERATOR = 4
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def _build_first_byte_table():
+    table = [FB_ERROR] * 256
+    for c in '0123456789':
+        table[ord(c)] = FB_INTEGER
+    for c in LETTERS + '_':
+        table[ord(c)] = FB_IDENTIFIER
+    for c in SINGLE_CHAR_TOKENS:
+        table[ord(c)] = FB_SINGLE
+    for c in '<>=!/':
+        table[ord(c)] = FB_OPERATOR
+    return table
+
+
+def _build_ident_chars():
+    table = [False] * 256
+    for c in LETTERS + '_0123456789':
+        table[ord(c)] = True
+    return table
+
+
+def _build_whitespace_chars():
+    table = [False] * 256
+    for c in ' \t\n\r\f\v':
+        table[ord(c)] = True
+    return table
+
+
+def _build_keyword_first():
+    table = [False] * 256
+    for kw in KEYWORDS:
+        table[ord(kw[0])] = True
+    return table
+
+
+FIRST_BYTE_TABLE = _build_first_byte_table()
+IDENT_CHARS = _build_ident_chars()
+WHITESPACE_CHARS = _build_whitespace_chars()
+KEYWORD_FIRST = _build_keyword_first()
+
+SIMPLE_ESCAPES = dict.fromkeys('abfnrtv0')
+
+# Preformatted text of every two-character backslash escape, so emitting
+# one doesn't have to slice it back out of the source.
+ESCAPE_TEXT = ['\\' + chr(i) for i in range(256)]
+
+
+def _is_hex_digit(c):
+    return ('0' <= c <= '9') or ('a' <= c <= 'f') or ('A' <= c <= 'F')
+
+
+def _find_line_starts(s):
+    line_starts = [0]
+    pos = s.find("\n")
+    while pos >= 0:
+        line_starts.append(pos + 1)
+        pos = s.find("\n", pos + 1)
+    return line_starts
+
+
+def _line_index(line_starts, pos):
+    # The greatest i such that line_starts[i] <= pos, by binary search.
+    lo = 0
+    hi = len(line_starts)
+    while lo < hi:
+        mid = (lo + hi) >> 1
+        if line_starts[mid] <= pos:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo - 1
 
-RAW_DQ_STRING_RULES = [
-    ('RAW_ESC', r'\\.'),
-    ('RAW_CHAR', r'[^"\\]'),
-    ('ST_ENDRAW', r'"'),
-]
 
-RAW_SQ_STRING_RULES = [
-    ('RAW_ESC', r"\\."),
-    ('RAW_CHAR', r"[^'\\]"),
-    ('ST_ENDRAW', r"'"),
-]
+class TokenList(object):
+    # The parser pulls tokens from here one at a time; all the scanning
+    # work already happened in tokenize_all(), so next() is an index bump.
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.idx = 0
 
+    def __iter__(self):
+        return self
 
-TOKENS = [x[0] for x in QUILL_RULES + INTERP_STRING_RULES + RAW_DQ_STRING_RULES] + [x.upper() for x in KEYWORDS]
+    def __next__(self):
+        return self.next()
 
-KEYWORD_DICT = dict.fromkeys(KEYWORDS)
+    def next(self):
+        idx = self.idx
+        if idx >= len(self.tokens):
+            raise StopIteration
+        self.idx = idx + 1
+        return self.tokens[idx]
 
 
 class QuillLexerStream(object):
@@ -164,6 +276,7 @@ class QuillLexerStream(object):
 
         self.idx = 0
         self._lineno = 1
+        self._line_starts = _find_line_starts(s)
 
     @property
     def state(self):
@@ -182,15 +295,11 @@ class QuillLexerStream(object):
         return self.next()
 
     def _update_pos(self, match_start, match_end):
+        # Returns the line number at match_start and advances idx.
         lineno = self._lineno
         self.idx = match_end
-        self._lineno += self.s.count("\n", match_start, match_end)
-        last_nl = self.s.rfind("\n", 0, match_start)
-        if last_nl < 0:
-            colno = match_start + 1
-        else:
-            colno = match_start - last_nl
-        return SourceRange(match_start, match_end, lineno, colno)
+        self._lineno = _line_index(self._line_starts, match_end) + 1
+        return lineno
 
     def next(self):
         while True:
@@ -198,60 +307,214 @@ class QuillLexerStream(object):
                 if not self.state.end_allowed:
                     raise self.parse_error("unterminated string")
                 raise StopIteration
-            if self.state.name == 'INITIAL':
-                assert len(self.state.ignore_rules) == 2
-                whitespace_rule = self.state.ignore_rules[0]
-                match = whitespace_rule.matches(self.s, self.idx)
-                if match is not None:
-                    source_range = self._update_pos(match.start, match.end)
-                    if "\n" in self.s[match.start:match.end]:
-                        if self._last_token and self._last_token.name not in QUILL_NO_ALI:
-                            continue
-                        token = Token(
-                            'SEMICOLON', self.s[match.start:match.end], source_range
-                        )
-                        self._last_token = token
-                        return token
-                else:
-                    match = self.state.ignore_rules[1].matches(self.s, self.idx)
-                    if match is not None:
-                        self._update_pos(match.start, match.end)
+            state = self.state
+            if state.quote is not None:
+                return self.next_string_token(state)
+            s = self.s
+            n = len(s)
+            i = self.idx
+            saw_nl = False
+            while i < n and WHITESPACE_CHARS[ord(s[i])]:
+                if s[i] == '\n':
+                    saw_nl = True
+                i += 1
+            if i > self.idx:
+                start = self.idx
+                lineno = self._update_pos(start, i)
+                if saw_nl and state.name == 'INITIAL':
+                    if self._last_token and self._last_token.name not in QUILL_NO_ALI:
                         continue
-                    break
-            else:
-                for rule in self.state.ignore_rules:
-                    match = rule.matches(self.s, self.idx)
-                    if match:
-                        self._update_pos(match.start, match.end)
-                        break
-                else:
-                    break
-
-        for rule in self.state.rules:
-            match = rule.matches(self.s, self.idx)
-            if match:
-                source_range = self._update_pos(match.start, match.end)
-                val = self.s[match.start:match.end]
-                if val in KEYWORD_DICT:
-                    name = val.upper()
+                    colno = start - self._line_starts[lineno - 1] + 1
+                    token = Token('SEMICOLON', s[start:i], start, i, lineno,
+                                  colno)
+                    self._last_token = token
+                    return token
+                continue
+            if s[i] == '#':
+                # Comments run to the end of the line; the INTERP state keeps
+                # the terminator of its historical '#[^n]+' pattern.
+                if state.name == 'INITIAL':
+                    terminator = '\n'
                 else:
-                    name = rule.name
-                token = Token(name, val, source_range)
-                self._last_token = token
-                if name in self.state.transitions:
-                    self.transition_state(self.state.transitions[name])
-                return token
-        else:
+                    terminator = 'n'
+                if i + 1 < n and s[i + 1] != terminator:
+                    end = s.find(terminator, i + 1)
+                    if end < 0:
+                        end = n
+                    self._update_pos(i, end)
+                    continue
+            return self.next_quill_token()
+
+    def next_quill_token(self):
+        # Hand-written recognizer for the main token set: one table lookup
+        # on the first byte, then a direct scan per token class. This avoids
+        # probing every rule's regex at every position.
+        s = self.s
+        n = len(s)
+        idx = self.idx
+        c = s[idx]
+        kind = FIRST_BYTE_TABLE[ord(c)]
+        if kind == FB_SINGLE:
+            return self.emit_const(SINGLE_CHAR_TOKENS[c], c, idx, idx + 1)
+        elif kind == FB_IDENTIFIER:
+            if c == 'r' and idx + 1 < n:
+                c1 = s[idx + 1]
+                if c1 == '"':
+                    return self.emit_const('ST_RAW_DQ_STRING', 'r"', idx, idx + 2)
+                if c1 == "'":
+                    return self.emit_const('ST_RAW_SQ_STRING', "r'", idx, idx + 2)
+            i = idx + 1
+            while i < n and IDENT_CHARS[ord(s[i])]:
+                i += 1
+            if KEYWORD_FIRST[ord(c)]:
+                return self.emit('IDENTIFIER', idx, i)
+            return self.emit_verbatim('IDENTIFIER', idx, i)
+        elif kind == FB_INTEGER:
+            i = idx + 1
+            while i < n and '0' <= s[i] <= '9':
+                i += 1
+            return self.emit_verbatim('INTEGER', idx, i)
+        elif kind == FB_OPERATOR:
+            if idx + 1 < n:
+                c1 = s[idx + 1]
+            else:
+                c1 = '\0'
+            if c == '<':
+                if c1 == '=':
+                    return self.emit_const('LE', '<=', idx, idx + 2)
+                return self.emit_const('LT', '<', idx, idx + 1)
+            if c == '>':
+                if c1 == '=':
+                    return self.emit_const('GE', '>=', idx, idx + 2)
+                return self.emit_const('GT', '>', idx, idx + 1)
+            if c == '=':
+                if c1 == '=':
+                    return self.emit_const('EQ', '==', idx, idx + 2)
+                return self.emit_const('ASSIGN', '=', idx, idx + 1)
+            if c == '!' and c1 == '=':
+                return self.emit_const('NE', '!=', idx, idx + 2)
+            if c == '/' and c1 == '/':
+                return self.emit_const('TRUEDIV', '//', idx, idx + 2)
+        raise self.parse_error("unrecognized token")
+
+    def next_string_token(self, state):
+        # Hand-written scanner for the string states. A run of plain
+        # characters becomes a single CHAR/RAW_CHAR token located with a
+        # direct scan, and escape sequences are dispatched on the character
+        # after the backslash; no per-character regex probing.
+        s = self.s
+        n = len(s)
+        idx = self.idx
+        quote = state.quote
+        c = s[idx]
+        if c == quote:
+            if state.raw:
+                return self.emit_const('ST_ENDRAW', c, idx, idx + 1)
+            return self.emit_const('ST_ENDSTRING', c, idx, idx + 1)
+        if state.raw:
+            if c == '\\':
+                if idx + 1 < n and s[idx + 1] != '\n':
+                    return self.emit_const('RAW_ESC', ESCAPE_TEXT[ord(s[idx + 1])], idx, idx + 2)
+                raise self.parse_error("unrecognized token")
+            i = idx + 1
+            while i < n and s[i] != quote and s[i] != '\\':
+                i += 1
+            return self.emit_verbatim('RAW_CHAR', idx, i)
+        if c == '\\':
+            return self.next_string_escape(state)
+        if state.interp and c == '$' and idx + 1 < n and s[idx + 1] == '{':
+            return self.emit_const('ST_INTERP', '${', idx, idx + 2)
+        interp = state.interp
+        i = idx
+        while i < n:
+            c1 = s[i]
+            if c1 == quote or c1 == '\\':
+                break
+            if interp and c1 == '$' and i + 1 < n and s[i + 1] == '{':
+                break
+            i += 1
+        return self.emit_verbatim('CHAR', idx, i)
+
+    def next_string_escape(self, state):
+        s = self.s
+        n = len(s)
+        idx = self.idx
+        if idx + 1 >= n:
             raise self.parse_error("unrecognized token")
+        c1 = s[idx + 1]
+        if c1 == state.quote:
+            return self.emit_const('ESC_QUOTE', ESCAPE_TEXT[ord(c1)], idx, idx + 2)
+        if c1 == '\\':
+            return self.emit_const('ESC_ESC', '\\\\', idx, idx + 2)
+        if c1 in SIMPLE_ESCAPES or (state.interp and c1 == '$'):
+            return self.emit_const('ESC_SIMPLE', ESCAPE_TEXT[ord(c1)], idx, idx + 2)
+        if c1 == 'x':
+            if (idx + 3 < n and _is_hex_digit(s[idx + 2]) and
+                    _is_hex_digit(s[idx + 3])):
+                return self.emit_verbatim('ESC_HEX_8', idx, idx + 4)
+            raise self.parse_error("unrecognized token")
+        if c1 == 'u':
+            if idx + 2 < n and s[idx + 2] == '{':
+                i = idx + 3
+                while i < n and _is_hex_digit(s[i]):
+                    i += 1
+                if i > idx + 3 and i < n and s[i] == '}':
+                    return self.emit_verbatim('ESC_HEX_ANY', idx, i + 1)
+                raise self.parse_error("unrecognized token")
+            if (idx + 5 < n and _is_hex_digit(s[idx + 2]) and
+                    _is_hex_digit(s[idx + 3]) and _is_hex_digit(s[idx + 4]) and
+                    _is_hex_digit(s[idx + 5])):
+                return self.emit_verbatim('ESC_HEX_16', idx, idx + 6)
+            raise self.parse_error("unrecognized token")
+        return self.emit_const('ESC_UNRECOGNISED', ESCAPE_TEXT[ord(c1)], idx, idx + 2)
+
+    def emit(self, name, start, end):
+        # Only identifiers sharing a first byte with some keyword come
+        # through here; everything else skips the keyword lookup.
+        val = self.s[start:end]
+        return self._emit_token(KEYWORD_TOKEN.get(val, name), val, start, end)
+
+    def emit_verbatim(self, name, start, end):
+        # Like emit, but never reclassifies the value as a keyword.
+        return self._emit_token(name, self.s[start:end], start, end)
+
+    def emit_const(self, name, val, start, end):
+        # For tokens whose text is already known (punctuation, operators,
+        # escape sequences): no need to slice it back out of the source.
+        return self._emit_token(name, val, start, end)
+
+    def _emit_token(self, name, val, start, end):
+        lineno = self._update_pos(start, end)
+        colno = start - self._line_starts[lineno - 1] + 1
+        token = Token(name, val, start, end, lineno, colno)
+        self._last_token = token
+        if name in self.state.transitions:
+            self.transition_state(self.state.transitions[name])
+        return token
+
+    def tokenize_all(self):
+        # Run the scanner over the whole source in one go and collect the
+        # tokens into a flat list, so parsing never interleaves with lexing.
+        tokens = []
+        while True:
+            try:
+                token = self.next()
+            except StopIteration:
+                break
+            tokens.append(token)
+        return tokens
 
     def parse_error(self, msg):
-        last_nl = self.s.rfind("\n", 0, self.idx)
-        if last_nl < 0:
+        line_start = self._line_starts[self._lineno - 1]
+        if self._lineno == 1:
             colno = self.idx - 1
         else:
-            colno = self.idx - last_nl - 1
+            colno = self.idx - line_start
+        line_end = self.s.find("\n", line_start)
+        if line_end < 0:
+            line_end = len(self.s)
         return ParseError(msg,
-                          self.s.splitlines()[self._lineno - 1],
+                          self.s[line_start:line_end],
                           self._filename, self._lineno, colno, colno + 1)
 
 
@@ -263,23 +526,20 @@ class QuillLexer(object):
         return self.states[name]
 
     def lex(self, filename, s):
-        return QuillLexerStream(self, filename, s)
+        stream = QuillLexerStream(self, filename, s)
+        return TokenList(stream.tokenize_all())
 
 
 class LexerState(object):
-    def __init__(self, name, end_allowed):
+    def __init__(self, name, end_allowed, quote=None, raw=False,
+                 interp=False):
         self.name = name
         self.end_allowed = end_allowed
-        self.rules = []
-        self.ignore_rules = []
+        self.quote = quote
+        self.raw = raw
+        self.interp = interp
         self.transitions = {}
 
-    def add(self, name, pattern, flags=0):
-        self.rules.append(Rule(name, pattern, flags=flags))
-
-    def ignore(self, pattern, flags=0):
-        self.ignore_rules.append(Rule("", pattern, flags=flags))
-
     def push_state(self, name, state):
         assert name not in self.transitions
         self.transitions[name] = state
@@ -293,12 +553,18 @@ class QuillLexerGenerator(object):
     def __init__(self):
         self.states = {}
 
-    def state(self, name, end_allowed=True):
+    def state(self, name, end_allowed=True, quote=None, raw=False,
+              interp=False):
         assert name not in self.states
-        self.states[name] = LexerState(name, end_allowed)
+        self.states[name] = LexerState(name, end_allowed, quote, raw, interp)
         return self.states[name]
 
     def build(self):
+        # Validate the state graph here, once, rather than via asserts on
+        # the per-token path.
+        for state in self.states.values():
+            for target in state.transitions.values():
+                assert target is None or target in self.states
         return QuillLexer(self.states)
 
 
@@ -306,49 +572,32 @@ def get_lexer():
     lg = QuillLexerGenerator()
 
     initial = lg.state('INITIAL')
-    for name, rule in QUILL_RULES:
-        initial.add(name, rule)
-    initial.ignore('\s+')
-    initial.ignore('#[^\n]+')
     initial.push_state('ST_DQ_STRING', 'DQ_STRING')
     initial.push_state('ST_SQ_STRING', 'SQ_STRING')
     initial.push_state('ST_INTERP_STRING', 'INTERP_STRING')
     initial.push_state('ST_RAW_DQ_STRING', 'RAW_DQ_STRING')
     initial.push_state('ST_RAW_SQ_STRING', 'RAW_SQ_STRING')
 
-    dq_string = lg.state('DQ_STRING', end_allowed=False)
-    for name, rule in DQ_STRING_RULES:
-        dq_string.add(name, rule)
+    dq_string = lg.state('DQ_STRING', end_allowed=False, quote='"')
     dq_string.pop_state('ST_ENDSTRING')
 
-    sq_string = lg.state('SQ_STRING', end_allowed=False)
-    for name, rule in SQ_STRING_RULES:
-        sq_string.add(name, rule)
+    sq_string = lg.state('SQ_STRING', end_allowed=False, quote="'")
     sq_string.pop_state('ST_ENDSTRING')
 
-    interp_string = lg.state('INTERP_STRING', end_allowed=False)
-    for name, rule in INTERP_STRING_RULES:
-        interp_string.add(name, rule)
+    interp_string = lg.state('INTERP_STRING', end_allowed=False, quote='`',
+                             interp=True)
     interp_string.push_state('ST_INTERP', 'INTERP')
     interp_string.pop_state('ST_ENDSTRING')
 
-    dq_raw = lg.state('RAW_DQ_STRING', end_allowed=False)
-    for name, rule in RAW_DQ_STRING_RULES:
-        dq_raw.add(name, rule)
+    dq_raw = lg.state('RAW_DQ_STRING', end_allowed=False, quote='"', raw=True)
     dq_raw.pop_state('ST_ENDRAW')
 
-    sq_raw = lg.state('RAW_SQ_STRING', end_allowed=False)
-    for name, rule in RAW_SQ_STRING_RULES:
-        sq_raw.add(name, rule)
+    sq_raw = lg.state('RAW_SQ_STRING', end_allowed=False, quote="'", raw=True)
     sq_raw.pop_state('ST_ENDRAW')
 
-    # This is the same as the main state, except some rules are unused and we
-    # pop the lexer state when we see a RIGHT_CURLY_BRACE.
+    # This is the same as the main state, except we pop the lexer state when
+    # we see a RIGHT_CURLY_BRACE.
     interp = lg.state('INTERP', end_allowed=False)
-    for name, rule in QUILL_RULES:
-        interp.add(name, rule)
-    interp.ignore('\s+')
-    interp.ignore("#[^n]+")
     interp.push_state('ST_DQ_STRING', 'DQ_STRING')
     interp.push_state('ST_SQ_STRING', 'SQ_STRING')
     interp.push_state('ST_INTERP_STRING', 'INTERP_STRING')
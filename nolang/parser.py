@@ -35,6 +35,25 @@ def errorhandler(state, lookahead, msg="Parsing error"):
                      (sourcepos[1] - sourcepos[0]) + colno - 1)
 
 
+def _is_ascii(s):
+    for i in range(len(s)):
+        if ord(s[i]) >= 0x80:
+            return False
+    return True
+
+
+def _build_simple_escape_table():
+    table = ['\0'] * 256
+    for src, dst in [('a', '\a'), ('b', '\b'), ('f', '\f'), ('n', '\n'),
+                     ('r', '\r'), ('t', '\t'), ('v', '\v'), ('0', '\0'),
+                     ('$', '$')]:
+        table[ord(src)] = dst
+    return table
+
+
+SIMPLE_ESCAPE_TABLE = _build_simple_escape_table()
+
+
 def hex_to_utf8(state, token, s):
     try:
         uchr = UNICHR(int(s, 16))
@@ -44,8 +63,17 @@ def hex_to_utf8(state, token, s):
         raise errorhandler(state, token, msg="Error encoding %s" % s)
 
 
+_parser = None
+
+
 def get_parser():
-    pg = rply.ParserGenerator(TOKENS, precedence=[
+    global _parser
+    if _parser is not None:
+        return _parser
+    # cache_id makes rply persist the LALR tables to its user cache dir,
+    # keyed by a hash of the grammar, so unchanged grammars skip table
+    # construction on startup.
+    pg = rply.ParserGenerator(TOKENS, cache_id='nolang', precedence=[
         ('left', ['AND']),
         ('left', ['OR']),
         ('left', ['EQ', 'LT', 'GT', 'IN', 'NE', 'LE', 'GE']),
@@ -348,10 +376,11 @@ def get_parser():
     @pg.production('string : ST_RAW_SQ_STRING rawstringcontent ST_ENDRAW')
     def expression_string_expand(state, p):
         val = ''.join(p[1].get_strparts())
-        try:
-            str_decode_utf_8(val, len(val), 'strict', final=True)
-        except UnicodeDecodeError:
-            raise errorhandler(state, p[1], msg="Unicode error")
+        if not _is_ascii(val):
+            try:
+                str_decode_utf_8(val, len(val), 'strict', final=True)
+            except UnicodeDecodeError:
+                raise errorhandler(state, p[1], msg="Unicode error")
         return ast.String(val, srcpos=sr(p))
 
     @pg.production('expression : ST_INTERP_STRING interpstr ST_ENDSTRING')
@@ -374,15 +403,17 @@ def get_parser():
     @pg.production('interpstr : stringcontent')
     def interpstr_start(state, p):
         val = ''.join(p[0].get_strparts())
-        str_decode_utf_8(val, len(val), 'strict', final=True)
+        if not _is_ascii(val):
+            str_decode_utf_8(val, len(val), 'strict', final=True)
         return ast.InterpStringContents([val], [])
 
     @pg.production('interpstr : interpstr ST_INTERP expression RIGHT_CURLY_BRACE stringcontent')
     def interpstr_part(state, p):
         val = ''.join(p[4].get_strparts())
-        str_decode_utf_8(val, len(val), 'strict', final=True)
-        return ast.InterpStringContents(
-            p[0].get_strings() + [val], p[0].get_exprs() + [p[2]])
+        if not _is_ascii(val):
+            str_decode_utf_8(val, len(val), 'strict', final=True)
+        p[0].append_segment(val, p[2])
+        return p[0]
 
     @pg.production('stringcontent : ')
     def string_empty(state, p):
@@ -390,53 +421,45 @@ def get_parser():
 
     @pg.production('stringcontent : stringcontent ESC_QUOTE')
     def string_esc_quote(state, p):
-        return ast.StringContent(p[0].get_strparts() + [p[1].getstr()[1]],
-            srcpos=sr(p))
+        p[0].append_part(p[1].getstr()[1], p[1].getsrcpos()[1])
+        return p[0]
 
     @pg.production('stringcontent : stringcontent ESC_ESC')
     def string_esc_esc(state, p):
-        return ast.StringContent(p[0].get_strparts() + ['\\'],
-            srcpos=sr(p))
+        p[0].append_part('\\', p[1].getsrcpos()[1])
+        return p[0]
 
     @pg.production('stringcontent : stringcontent ESC_SIMPLE')
     def string_esc_simple(state, p):
-        part = {
-            'a': '\a',
-            'b': '\b',
-            'f': '\f',
-            'n': '\n',
-            'r': '\r',
-            't': '\t',
-            'v': '\v',
-            '0': '\0',
-            '$': '$',
-        }[p[1].getstr()[1]]
-        return ast.StringContent(p[0].get_strparts() + [part], srcpos=sr(p))
+        part = SIMPLE_ESCAPE_TABLE[ord(p[1].getstr()[1])]
+        p[0].append_part(part, p[1].getsrcpos()[1])
+        return p[0]
 
     @pg.production('stringcontent : stringcontent ESC_HEX_8')
     @pg.production('stringcontent : stringcontent ESC_HEX_16')
     def string_esc_hex_fixed(state, p):
         s = p[1].getstr()
-        return ast.StringContent(p[0].get_strparts() + [hex_to_utf8(state, p[0],
-            s[2:])], srcpos=sr(p))
+        p[0].append_part(hex_to_utf8(state, p[0], s[2:]), p[1].getsrcpos()[1])
+        return p[0]
 
     @pg.production('stringcontent : stringcontent ESC_HEX_ANY')
     def string_esc_hex_any(state, p):
         s = p[1].getstr()
         end = len(s) - 1
         assert end >= 0
-        return ast.StringContent(p[0].get_strparts() + [hex_to_utf8(state, p[0],
-            s[3:end])], srcpos=sr(p))
+        p[0].append_part(hex_to_utf8(state, p[0], s[3:end]),
+            p[1].getsrcpos()[1])
+        return p[0]
 
     @pg.production('stringcontent : stringcontent ESC_UNRECOGNISED')
     def string_esc_unrecognised(state, p):
-        return ast.StringContent(p[0].get_strparts() + [p[1].getstr()],
-            srcpos=sr(p))
+        p[0].append_part(p[1].getstr(), p[1].getsrcpos()[1])
+        return p[0]
 
     @pg.production('stringcontent : stringcontent CHAR')
     def string_char(state, p):
-        return ast.StringContent(p[0].get_strparts() + [p[1].getstr()],
-            srcpos=sr(p))
+        p[0].append_part(p[1].getstr(), p[1].getsrcpos()[1])
+        return p[0]
 
     @pg.production('rawstringcontent : ')
     def rawstring_empty(state, p):
@@ -445,8 +468,8 @@ def get_parser():
     @pg.production('rawstringcontent : rawstringcontent RAW_ESC')
     @pg.production('rawstringcontent : rawstringcontent RAW_CHAR')
     def rawstring_char(state, p):
-        return ast.StringContent(p[0].get_strparts() + [p[1].getstr()],
-            srcpos=sr(p))
+        p[0].append_part(p[1].getstr(), p[1].getsrcpos()[1])
+        return p[0]
 
     @pg.production('atom : TRUE')
     def atom_true(state, p):
@@ -595,4 +618,5 @@ def get_parser():
     res = pg.build()
     if res.lr_table.sr_conflicts:
         raise Exception("shift reduce conflicts")
+    _parser = res
     return res